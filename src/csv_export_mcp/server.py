@@ -1,48 +1,205 @@
 #!/usr/bin/env python3
 """CSV Export MCP Server - Python implementation."""
 
-import csv
-import json
-import sys
+import asyncio
+import gzip
+import logging
+import os
+import string
 import uuid
-from io import StringIO
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from operator import itemgetter
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, Iterator, List, Literal, Optional, Tuple
 
 from mcp.server.fastmcp import FastMCP
 
+try:
+    import zstandard
+except ImportError:  # optional, only needed for compression="zstd"
+    zstandard = None
+
+# Progress messages are off by default so exports don't pay for stderr
+# writes; to see them, lower this logger's level below WARNING and make sure
+# a handler is configured (e.g. logging.basicConfig)
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.WARNING)
+
 # Export directory configuration
 EXPORT_DIR = "/tmp/protex-intelligence-file-exports"
 
+# Set once the export directory has been created or found
+_export_dir_ready = False
+
+# CSV output configuration
+LINE_TERMINATOR = "\r\n"
+WRITE_BATCH_ROWS = 1024
+WRITE_WORKERS = 4
+COLUMN_BATCH_ROWS = 1024
+
+# Output compression: file extension and MIME type for each format
+COMPRESSION_FORMATS = {
+    None: (".csv", "text/csv"),
+    "gzip": (".csv.gz", "application/gzip"),
+    "zstd": (".csv.zst", "application/zstd"),
+}
+GZIP_LEVEL = 6
+ZSTD_LEVEL = 3
+
+# Value types formatted column-at-a-time with a bare repr() call
+_NUMERIC_TYPES = frozenset((int, float, bool))
+_STR_TYPE = frozenset((str,))
+# Every character repr() can produce for an int, float or bool
+_NUMERIC_CHARS = frozenset("0123456789.+-eEinfaTrueFals")
+
+# Maps every unsafe ASCII character to '_' for filename sanitization
+_SAFE_FILENAME_CHARS = frozenset(string.ascii_letters + string.digits + "_-")
+_SANITIZE_TABLE = {
+    i: ord("_") for i in range(128) if chr(i) not in _SAFE_FILENAME_CHARS
+}
+
+# Worker pool for blocking file writes, shared by all concurrent exports
+_write_executor = ThreadPoolExecutor(
+    max_workers=WRITE_WORKERS, thread_name_prefix="csv-export-write"
+)
+
+
+def _quote(value: str) -> str:
+    """Wrap a CSV field in quotes, doubling any embedded quote characters."""
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _iter_csv_lines(
+    data: List[Dict[str, Any]],
+    delimiter: str,
+    include_headers: bool
+) -> Iterator[str]:
+    """Yield CSV lines (without terminators) for a non-empty array of objects.
+    
+    Matches ``csv.DictWriter`` with its default dialect, but builds each line
+    with a single ``str.join`` and only quotes fields that contain special
+    characters. Rows are processed in column-major batches so homogeneous
+    int, float and str columns are formatted without per-cell Python calls.
+    """
+    if len(delimiter) != 1:
+        raise ValueError("Delimiter must be a single character")
+    
+    # Get headers from first object
+    header_keys = data[0].keys()
+    header_tuple = tuple(header_keys)
+    field_count = len(header_tuple)
+    specials = frozenset((delimiter, '"', "\n", "\r"))
+    # A lone empty field must be quoted, otherwise the row reads back as blank
+    single_column = field_count == 1
+    # itemgetter returns a bare value rather than a tuple for a single key
+    fast_getter = itemgetter(*header_tuple) if field_count > 1 else None
+    
+    # repr() of an int, float or bool can never contain a quote or newline
+    numeric_safe = delimiter not in _NUMERIC_CHARS
+    
+    def _fmt(value: Any) -> str:
+        if value is None:
+            return ""
+        if not isinstance(value, str):
+            value = str(value)
+        if specials.isdisjoint(value):
+            return value
+        return _quote(value)
+    
+    def _format_row(row: Dict[str, Any]) -> str:
+        if row.keys() != header_keys:
+            wrong_fields = row.keys() - header_keys
+            if wrong_fields:
+                raise ValueError(
+                    "dict contains fields not in fieldnames: "
+                    + ", ".join([repr(x) for x in wrong_fields])
+                )
+        line = delimiter.join([_fmt(row.get(h)) for h in header_tuple])
+        return '""' if single_column and not line else line
+    
+    def _format_column(column: Tuple[Any, ...]) -> Iterable[str]:
+        types = set(map(type, column))
+        if numeric_safe and types <= _NUMERIC_TYPES:
+            # repr() gives the same text as str() for these types but is a
+            # plain builtin call rather than a str() type construction
+            return map(repr, column)
+        if types == _STR_TYPE:
+            joined = "".join(column)
+            if (
+                delimiter not in joined
+                and '"' not in joined
+                and "\n" not in joined
+                and "\r" not in joined
+            ):
+                return column
+        return map(_fmt, column)
+    
+    if include_headers:
+        line = delimiter.join([_fmt(h) for h in header_tuple])
+        yield '""' if single_column and not line else line
+    
+    if fast_getter is None:
+        yield from map(_format_row, data)
+        return
+    
+    for start in range(0, len(data), COLUMN_BATCH_ROWS):
+        batch = data[start:start + COLUMN_BATCH_ROWS]
+        
+        # Transpose the batch into columns with C-level itemgetter/zip, then
+        # format each column with a path specialized to its value types
+        rows = None
+        if set(map(len, batch)) == {field_count}:
+            try:
+                rows = list(map(fast_getter, batch))
+            except KeyError:
+                pass
+        if rows is None:
+            # Some rows have missing or extra keys; check them one at a time
+            yield from map(_format_row, batch)
+            continue
+        
+        columns = [_format_column(column) for column in zip(*rows)]
+        yield from map(delimiter.join, zip(*columns))
+
 
 def convert_to_csv(
     data: List[Dict[str, Any]], 
     delimiter: str = ",", 
     include_headers: bool = True
 ) -> str:
-    """Convert array of objects to CSV string."""
-    if not data:
-        return ""
-    
-    # Get headers from first object
-    headers = list(data[0].keys())
+    """Convert array of objects to CSV string.
     
-    # Use StringIO to build CSV
-    output = StringIO()
-    writer = csv.DictWriter(output, fieldnames=headers, delimiter=delimiter)
+    data must be non-empty; callers are expected to validate it first, as
+    csv_export does.
+    """
+    lines = list(_iter_csv_lines(data, delimiter, include_headers))
+    lines.append("")
+    return LINE_TERMINATOR.join(lines)
+
+
+class CountingWriter:
+    """Unbuffered file descriptor writer that keeps a running total of bytes.
     
-    if include_headers:
-        writer.writeheader()
+    Each chunk is handed straight to ``os.write``, avoiding the extra copy
+    into a ``BufferedWriter``/``TextIOWrapper`` buffer.
+    """
     
-    for row in data:
-        writer.writerow(row)
+    def __init__(self, fd: int) -> None:
+        self._fd = fd
+        self.bytes_written = 0
     
-    return output.getvalue()
+    def write(self, data: bytes) -> int:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(self._fd, view):]
+        self.bytes_written += len(data)
+        return len(data)
 
 
-def get_file_size_string(content: str) -> str:
-    """Calculate file size string from content."""
-    bytes_size = len(content.encode('utf-8'))
+def get_file_size_string(bytes_size: int) -> str:
+    """Format a byte count as a human readable size string."""
     kb = bytes_size / 1024
     
     if kb < 1024:
@@ -51,33 +208,137 @@ def get_file_size_string(content: str) -> str:
         return f"{kb / 1024:.2f} MB"
 
 
+def sanitize_filename(filename: str) -> str:
+    """Replace every character that isn't alphanumeric, '_' or '-' with '_'."""
+    if filename.isascii():
+        return filename.translate(_SANITIZE_TABLE)
+    # Non-ASCII letters and digits are kept, so check those per character
+    return "".join(c if c.isalnum() or c in "_-" else "_" for c in filename)
+
+
 async def ensure_export_directory() -> None:
-    """Ensure export directory exists, create if it doesn't."""
-    export_path = Path(EXPORT_DIR)
+    """Ensure export directory exists, create if it doesn't.
     
-    if export_path.exists():
-        print(f"✓ Export directory exists: {EXPORT_DIR}", file=sys.stderr)
-    else:
+    Only the first successful call touches the file system; later calls
+    return immediately.
+    """
+    global _export_dir_ready
+    
+    if _export_dir_ready:
+        return
+    
+    try:
+        await asyncio.get_running_loop().run_in_executor(
+            _write_executor,
+            partial(Path(EXPORT_DIR).mkdir, parents=True, exist_ok=True),
+        )
+        logger.info("Export directory ready: %s", EXPORT_DIR)
+    except Exception as e:
+        logger.error("Failed to create export directory: %s", e)
+        raise
+    
+    _export_dir_ready = True
+
+
+def _open_compressor(out: CountingWriter, compression: Optional[str]) -> Any:
+    """Wrap out in a streaming compressor, or return it as-is for plain CSV."""
+    if compression == "gzip":
+        return gzip.GzipFile(fileobj=out, mode="wb", compresslevel=GZIP_LEVEL)
+    if compression == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).stream_writer(
+            out, closefd=False
+        )
+    return out
+
+
+def _write_csv_file(
+    filepath: Path,
+    data: List[Dict[str, Any]],
+    delimiter: str,
+    include_headers: bool,
+    compression: Optional[str]
+) -> int:
+    """Write data as CSV to filepath in batches, returning bytes written.
+    
+    With compression, the count is of compressed bytes actually on disk.
+    """
+    fd = os.open(filepath, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
         try:
-            export_path.mkdir(parents=True, exist_ok=True)
-            print(f"✓ Created export directory: {EXPORT_DIR}", file=sys.stderr)
-        except Exception as e:
-            print(f"✗ Failed to create export directory: {e}", file=sys.stderr)
-            raise
+            out = CountingWriter(fd)
+            sink = _open_compressor(out, compression)
+            try:
+                lines = _iter_csv_lines(data, delimiter, include_headers)
+                while True:
+                    batch = list(islice(lines, WRITE_BATCH_ROWS))
+                    if not batch:
+                        break
+                    batch.append("")
+                    sink.write(LINE_TERMINATOR.join(batch).encode('utf-8'))
+            finally:
+                if sink is not out:
+                    # Flushes the compressor's trailer while fd is still open,
+                    # even on failure, so it can't be written later by the
+                    # garbage collector into a reused file descriptor
+                    sink.close()
+            # The server never reads exports back, so let the kernel drop their
+            # pages from the cache instead of evicting more useful data
+            if hasattr(os, "posix_fadvise"):
+                try:
+                    os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+                except OSError:
+                    # Only a hint; never fail a complete export over it
+                    pass
+        finally:
+            os.close(fd)
+    except Exception:
+        # Don't leave a truncated export behind if a row fails to convert
+        filepath.unlink(missing_ok=True)
+        raise
+    return out.bytes_written
 
 
-async def write_csv_to_file(csv_content: str, filename: str) -> str:
-    """Write CSV content to file system."""
+async def write_csv_to_file(
+    data: List[Dict[str, Any]],
+    filename: str,
+    delimiter: str = ",",
+    include_headers: bool = True,
+    compression: Optional[str] = None
+) -> Tuple[str, int]:
+    """Stream data as CSV to the file system.
+    
+    Lines are encoded and written in batches, so the full CSV text is never
+    held in memory. The write, including cleanup of a partial file on
+    failure, runs on a shared worker pool so the event loop stays free and
+    concurrent exports overlap. Each export gets a unique filename, so no
+    locking is needed between concurrent writes.
+    
+    Returns:
+        Tuple of the written file path and the number of bytes written
+    """
+    global _export_dir_ready
+    
     await ensure_export_directory()
     
     filepath = Path(EXPORT_DIR) / filename
+    loop = asyncio.get_running_loop()
+    write = partial(
+        _write_csv_file, filepath, data, delimiter, include_headers, compression
+    )
     
     try:
-        filepath.write_text(csv_content, encoding='utf-8')
-        print(f"✓ File written: {filepath}", file=sys.stderr)
-        return str(filepath)
+        try:
+            bytes_written = await loop.run_in_executor(_write_executor, write)
+        except FileNotFoundError:
+            # The directory was removed since it was last checked (e.g. by a
+            # /tmp cleaner); recreate it and retry this export once
+            _export_dir_ready = False
+            await ensure_export_directory()
+            bytes_written = await loop.run_in_executor(_write_executor, write)
+        logger.debug("File written: %s", filepath)
+        return str(filepath), bytes_written
     except Exception as e:
-        print(f"✗ Failed to write file: {e}", file=sys.stderr)
+        logger.error("Failed to write file: %s", e)
         raise
 
 
@@ -91,7 +352,8 @@ async def csv_export(
     filename: str = "output",
     description: str = None,
     delimiter: str = ",",
-    include_headers: bool = True
+    include_headers: bool = True,
+    compression: Optional[Literal["gzip", "zstd"]] = None
 ) -> dict:
     """Export data to CSV format and save to filesystem.
     
@@ -101,6 +363,7 @@ async def csv_export(
         description: Optional description of the file contents
         delimiter: CSV delimiter character
         include_headers: Whether to include column headers
+        compression: Optional output compression, "gzip" or "zstd"
         
     Returns:
         Dictionary with export results including path and file info
@@ -113,34 +376,45 @@ async def csv_export(
         if len(data) == 0:
             raise ValueError("Data array cannot be empty")
         
-        # Convert to CSV
-        csv_content = convert_to_csv(data, delimiter, include_headers)
+        if not isinstance(delimiter, str) or len(delimiter) != 1:
+            raise ValueError("Delimiter must be a single character")
+        
+        if compression == "zstd" and zstandard is None:
+            raise ValueError(
+                "zstd compression requires the 'zstandard' package; "
+                "install csv-export-mcp[zstd]"
+            )
         
         # Generate UUID and filename
-        file_uuid = str(uuid.uuid4())
-        sanitized_filename = "".join(c if c.isalnum() or c in "_-" else "_" for c in filename)
-        full_filename = f"{sanitized_filename}_{file_uuid}.csv"
-        file_size = get_file_size_string(csv_content)
+        file_uuid = uuid.uuid4().hex
+        sanitized_filename = sanitize_filename(filename)
+        extension, filetype = COMPRESSION_FORMATS[compression]
+        full_filename = f"{sanitized_filename}_{file_uuid}{extension}"
         row_count = len(data)
-        column_count = len(data[0].keys()) if data else 0
+        # Columns come from the first object, as in _iter_csv_lines
+        column_count = len(data[0])
         
-        # Write CSV to file system
-        filepath = await write_csv_to_file(csv_content, full_filename)
+        # Stream CSV to file system
+        filepath, bytes_written = await write_csv_to_file(
+            data, full_filename, delimiter, include_headers, compression
+        )
+        file_size = get_file_size_string(bytes_written)
         
-        print(f"✅ CSV generated: {full_filename} ({file_size})", file=sys.stderr)
-        print(f"   Rows: {row_count}, Columns: {column_count}", file=sys.stderr)
-        print(f"   Saved to: {filepath}", file=sys.stderr)
+        logger.info(
+            "CSV generated: %s (%s), rows: %d, columns: %d, saved to: %s",
+            full_filename, file_size, row_count, column_count, filepath
+        )
         
         # Return simplified response with essential information
         return {
             "path": full_filename,
-            "filetype": "text/csv",
+            "filetype": filetype,
             "filename": full_filename,
             "filesize": file_size,
         }
         
     except Exception as error:
-        print(f"Error processing CSV export: {error}", file=sys.stderr)
+        logger.error("Error processing CSV export: %s", error)
         
         return {
             "success": False,
@@ -0,0 +1,67 @@
+"""Differential tests: convert_to_csv must match csv.DictWriter byte for byte."""
+
+import csv
+from io import StringIO
+
+import pytest
+
+from csv_export_mcp.server import COLUMN_BATCH_ROWS, convert_to_csv
+
+
+def dictwriter_csv(data, delimiter=",", include_headers=True):
+    output = StringIO()
+    writer = csv.DictWriter(
+        output, fieldnames=list(data[0].keys()), delimiter=delimiter
+    )
+    if include_headers:
+        writer.writeheader()
+    for row in data:
+        writer.writerow(row)
+    return output.getvalue()
+
+
+CASES = {
+    "mixed_types": [
+        {"id": 1, "name": "a", "value": 1.5, "flag": True},
+        {"id": 2, "name": "b", "value": -2e16, "flag": False},
+    ],
+    "none_values": [{"a": None, "b": "x"}, {"a": 1, "b": None}],
+    "special_chars": [
+        {"a": 'say "hi"', "b": "x,y"},
+        {"a": "line\nbreak", "b": "carriage\rreturn"},
+        {"a": "tab\tsep", "b": "semi;colon"},
+    ],
+    "numeric_columns": [
+        {"i": 10, "f": 0.5, "e": 1e-07},
+        {"i": -3, "f": float("inf"), "e": 12345.678},
+    ],
+    "single_column": [{"a": ""}, {"a": None}, {"a": "z"}],
+    "single_empty_header": [{"": 1}],
+    "nested_values": [{"a": [1, 2], "b": {"k": "v"}}],
+    "missing_keys": [{"a": 1, "b": 2}, {"b": 3}, {"a": 4}],
+    "header_specials": [{"a,b": 1, 'q"': 2}],
+    "past_batch_size": (
+        [{"a": i, "b": f"s{i}"} for i in range(COLUMN_BATCH_ROWS + 5)]
+        + [{"a": None}]
+        + [{"a": i / 3, "b": 'q"'} for i in range(COLUMN_BATCH_ROWS)]
+    ),
+}
+
+
+@pytest.mark.parametrize("include_headers", [True, False])
+@pytest.mark.parametrize("delimiter", [",", ";", "\t", " ", ".", "e", "1"])
+@pytest.mark.parametrize("name", sorted(CASES))
+def test_matches_dictwriter(name, delimiter, include_headers):
+    data = CASES[name]
+    expected = dictwriter_csv(data, delimiter, include_headers)
+    assert convert_to_csv(data, delimiter, include_headers) == expected
+
+
+@pytest.mark.parametrize("rows", [1, COLUMN_BATCH_ROWS + 1])
+def test_extra_keys_raise_like_dictwriter(rows):
+    data = [{"a": 1, "b": 2}] * rows + [{"a": 1, "b": 2, "c": 3}]
+    message = "dict contains fields not in fieldnames"
+    with pytest.raises(ValueError, match=message):
+        dictwriter_csv(data)
+    with pytest.raises(ValueError, match=message):
+        convert_to_csv(data)
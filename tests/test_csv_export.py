@@ -0,0 +1,134 @@
+"""End-to-end tests for the csv_export tool against a temporary export dir."""
+
+import asyncio
+import gc
+import gzip
+import os
+
+import pytest
+
+from csv_export_mcp import server
+from csv_export_mcp.server import (
+    COMPRESSION_FORMATS,
+    convert_to_csv,
+    csv_export,
+    get_file_size_string,
+)
+
+
+DATA = [
+    {
+        "id": i,
+        "name": f"name {i}",
+        "value": i / 7,
+        "note": 'x,"y"' if i % 5 else None,
+    }
+    for i in range(3000)
+]
+
+
+def decompress_zstd(raw):
+    zstandard = pytest.importorskip("zstandard")
+    return zstandard.ZstdDecompressor().stream_reader(raw).read()
+
+
+DECOMPRESSORS = {
+    None: lambda raw: raw,
+    "gzip": gzip.decompress,
+    "zstd": decompress_zstd,
+}
+
+
+@pytest.fixture
+def export_dir(tmp_path, monkeypatch):
+    path = tmp_path / "exports"
+    monkeypatch.setattr(server, "EXPORT_DIR", str(path))
+    monkeypatch.setattr(server, "_export_dir_ready", False)
+    return path
+
+
+@pytest.mark.parametrize("compression", [None, "gzip", "zstd"])
+def test_export_round_trips(export_dir, compression):
+    if compression == "zstd":
+        pytest.importorskip("zstandard")
+    
+    result = asyncio.run(
+        csv_export(DATA, filename="report", compression=compression)
+    )
+    
+    extension, filetype = COMPRESSION_FORMATS[compression]
+    assert result["filename"].startswith("report_")
+    assert result["filename"].endswith(extension)
+    assert result["filetype"] == filetype
+    
+    raw = (export_dir / result["path"]).read_bytes()
+    assert DECOMPRESSORS[compression](raw) == convert_to_csv(DATA).encode("utf-8")
+    # The reported size is of the file on disk, i.e. after compression
+    assert result["filesize"] == get_file_size_string(len(raw))
+
+
+def test_compressed_export_is_smaller(export_dir):
+    plain = asyncio.run(csv_export(DATA))
+    packed = asyncio.run(csv_export(DATA, compression="gzip"))
+    
+    plain_size = (export_dir / plain["path"]).stat().st_size
+    packed_size = (export_dir / packed["path"]).stat().st_size
+    assert packed_size < plain_size
+    assert packed["filesize"] != plain["filesize"]
+
+
+@pytest.mark.parametrize("compression", [None, "gzip"])
+def test_bad_row_leaves_no_file(export_dir, compression):
+    data = DATA[:10] + [{**DATA[0], "extra": 1}]
+    
+    result = asyncio.run(csv_export(data, compression=compression))
+    
+    assert result["success"] is False
+    assert "extra" in result["error"]
+    assert list(export_dir.iterdir()) == []
+
+
+def test_bad_delimiter_rejected_before_writing(export_dir):
+    result = asyncio.run(csv_export(DATA, delimiter=";;", compression="gzip"))
+    
+    assert result["success"] is False
+    assert not export_dir.exists() or list(export_dir.iterdir()) == []
+
+
+def test_failed_gzip_write_does_not_touch_reused_fd(tmp_path):
+    data = [{"a": 1}, {"a": 1, "b": 2}]
+    
+    # excinfo keeps the traceback (and anything it references) alive while
+    # the export's fd number gets reused, as can happen on the write pool
+    with pytest.raises(ValueError) as excinfo:
+        server._write_csv_file(tmp_path / "bad.csv.gz", data, ",", True, "gzip")
+    
+    victim = tmp_path / "victim"
+    fd = os.open(victim, os.O_WRONLY | os.O_CREAT)
+    try:
+        os.write(fd, b"VICTIM\n")
+        del excinfo
+        gc.collect()
+    finally:
+        os.close(fd)
+    
+    assert victim.read_bytes() == b"VICTIM\n"
+    assert not (tmp_path / "bad.csv.gz").exists()
+
+
+def test_export_recreates_removed_directory(export_dir):
+    first = asyncio.run(csv_export(DATA))
+    assert "error" not in first
+    assert server._export_dir_ready
+    
+    # Simulate a /tmp cleaner removing the directory between exports
+    for path in export_dir.iterdir():
+        path.unlink()
+    export_dir.rmdir()
+    
+    second = asyncio.run(csv_export(DATA))
+    
+    assert "error" not in second
+    assert (export_dir / second["path"]).read_bytes() == (
+        convert_to_csv(DATA).encode("utf-8")
+    )